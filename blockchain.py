@@ -1,23 +1,80 @@
+import os
+import json
 import time
 import logging
+import collections
+import concurrent.futures
+import itertools
 from marshmallow import ValidationError
 import requests
 from persistence import Persistence
 from p2p import P2PNode 
 from models import Block
 import schema
-from transaction import Transaction
-from consensus import Consensus
+from transaction import Transaction, verify_transactions
+from consensus import Consensus, _mp_context
 from wallet import generate_wallet as wallet_create_wallet
+from nacl.signing import SigningKey
+from nacl.encoding import HexEncoder
+
+
+def _block_hash(block: Block, rehash=False):
+    """Top-level (picklable) helper so block hashes can be recomputed in worker processes."""
+    return block.recalculate_hash() if rehash else block.calculate_hash()
+
+
+def _iter_chain_blocks(response, chunk_size=65536):
+    """
+    Yield the block dicts of a streamed /chain response one at a time, decoding each
+    as soon as its bytes have arrived instead of buffering the whole document.
+    """
+    decoder = json.JSONDecoder()
+    response.encoding = response.encoding or 'utf-8'
+    chunks = response.iter_content(chunk_size=chunk_size, decode_unicode=True)
+    buffer = ""
+    pos = -1
+    # Skip ahead to the opening bracket of the "chain" array
+    while pos < 0:
+        chunk = next(chunks, None)
+        if chunk is None:
+            raise ValueError("Response has no chain")
+        buffer += chunk
+        key = buffer.find('"chain"')
+        if key >= 0:
+            pos = buffer.find('[', key)
+    pos += 1
+    while True:
+        # Skip separators between blocks
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        if pos < len(buffer) and buffer[pos] == ']':
+            return
+        try:
+            block_data, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # The next block is incomplete; read more
+            chunk = next(chunks, None)
+            if chunk is None:
+                raise ValueError("Truncated chain in response")
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+        yield block_data
+        pos = end
 
 
 class Blockchain(P2PNode, Persistence):
-    transaction_schema = schema.TransactionSchema()
-    block_schema = schema.BlockSchema()
     """
     Core Blockchain class. Manages the chain, transactions, and consensus,
     while inheriting P2P and Persistence functionality.
     """
+    transaction_schema = schema.TransactionSchema()
+    block_schema = schema.BlockSchema()
+    # Below this many blocks to hash, a process pool loses to hashing serially. A block
+    # hashes in ~21us, but shipping it to a worker and back costs ~25us (10us of it
+    # serial, in this process) on top of a 0.1-0.5s forkserver start-up that re-imports
+    # Flask/eventlet/nacl, so even 8 workers only pay off somewhere past ~80k blocks
+    parallel_validation_min_blocks = 100_000
     def __init__(self, host='127.0.0.1', port=5000):
         # Initialize the P2P and Persistence parent classes
         P2PNode.__init__(self, host, port)
@@ -25,15 +82,31 @@ class Blockchain(P2PNode, Persistence):
 
         # Core blockchain attributes
         self.chain = []
-        self.pending_transactions = []
+        self.pending_transactions = {}  # signature -> Transaction, in arrival order; mining takes the oldest
+        self._pending_by_sender = collections.defaultdict(float)  # sender address -> total pending spend
+        self._pending_count_by_sender = collections.Counter()  # sender address -> pending tx count
         self.difficulty = 4
         self.target_block_time = 10
-        self.balances = {}
+        # Missing addresses read as 0.0, so crediting needs no default branch; lookups that
+        # must not create entries (get_balance) still go through .get()
+        self.balances = collections.defaultdict(float)
         self.wallets = {}
         self.public_keys = {}
         self.initial_balance_txs = []  # Store initial balance transactions for genesis
+        self._pubkey_to_address = {}  # Reverse map of public_keys, kept in sync by create_wallet
+        self._chain_validated = False  # True once self.chain is known to be valid
+        self._wallet_version = 0  # Bumped whenever a wallet is added, for callers caching wallet lists
+        self._signing_keys = {}  # address -> SigningKey, decoded once per wallet
 
         self.load_from_disk()
+        self._pubkey_to_address = {pub: addr for addr, pub in self.public_keys.items()}
+        # Validate the loaded chain once, then memoize its hashes for later checks.
+        # The file on disk may have been edited, so every block is re-hashed here.
+        if self.chain and self.is_valid_chain()[0]:
+            for block in self.chain:
+                block.seal()
+                self._resolve_parties(block.transactions)
+            self._chain_validated = True
         if not self.chain:
             self.create_genesis_block()
 
@@ -41,6 +114,8 @@ class Blockchain(P2PNode, Persistence):
         address, private_key_hex, public_key_hex = wallet_create_wallet()
         self.wallets[address] = private_key_hex
         self.public_keys[address] = public_key_hex
+        self._pubkey_to_address[public_key_hex] = address
+        self._wallet_version += 1
         
         # Store the initial balance separately to never lose it
         if not hasattr(self, 'initial_wallet_balances'):
@@ -50,6 +125,7 @@ class Blockchain(P2PNode, Persistence):
         # Set current balance
         self.balances[address] = initial_balance
         logging.info(f"Created wallet {address[:10]}... with initial balance {initial_balance}")
+        self.mark_dirty()
             
         return address, private_key_hex, public_key_hex
 
@@ -65,7 +141,9 @@ class Blockchain(P2PNode, Persistence):
             timestamp=int(time.time()),
         )
         genesis_block.hash = genesis_block.calculate_hash()
+        genesis_block.seal()
         self.chain.append(genesis_block)
+        self._chain_validated = True
         
         # Rebuild balances to include initial wallet balances from genesis block
         self.rebuild_balances()
@@ -76,38 +154,31 @@ class Blockchain(P2PNode, Persistence):
     def get_latest_block(self):
         return self.chain[-1]
 
+    def get_signing_key(self, address):
+        """Return the SigningKey for one of our wallets, decoding its private key only once."""
+        signing_key = self._signing_keys.get(address)
+        if signing_key is None:
+            signing_key = self._signing_keys[address] = SigningKey(self.wallets[address], encoder=HexEncoder)
+        return signing_key
+
     def get_balance(self, address):
-        """Get the current balance for a given address, checking both address and public key."""
-        # First check if the address itself has a balance
-        if address in self.balances:
-            return self.balances[address]
-        
-        # If not found, check if this address has a corresponding public key with balance
-        if address in self.public_keys:
-            public_key = self.public_keys[address]
-            if public_key in self.balances:
-                return self.balances[public_key]
-        
-        # If the input is a public key, check if it has a corresponding address
-        for addr, pub_key in self.public_keys.items():
-            if pub_key == address and addr in self.balances:
-                return self.balances[addr]
-        
-        return 0
+        """Get the current balance for a given address or a wallet's public key."""
+        # Balances are only ever keyed by wallet address (or the raw key of a non-wallet
+        # recipient), so a public key just needs mapping to its address first
+        return self.balances.get(self._pubkey_to_address.get(address, address), 0)
 
     def add_transaction(self, tx: Transaction):
         """Adds a transaction to the pending pool after full validation."""
         try:
+            if tx.signature in self.pending_transactions:
+                raise ValueError("Transaction already in pending pool")
             validated_tx = self.transaction_schema.validate_transaction_dict(tx.to_dict())
 
             if not validated_tx.verify():
                 raise ValueError("Transaction signature invalid")
             
             # Convert sender public key to address for balance checking
-            pubkey_to_address = {pub: addr for addr, pub in self.public_keys.items()}
-            print(f"Validated sender: {validated_tx.sender}")
-            print(f"Known public keys: {list(pubkey_to_address.keys())}")
-            
+            pubkey_to_address = self._pubkey_to_address
             if validated_tx.sender not in pubkey_to_address:
                 raise ValueError("Sender public key not recognized")
             
@@ -117,40 +188,72 @@ class Blockchain(P2PNode, Persistence):
                 raise ValueError("Insufficient balance")
             
             # Double spend check in pending pool - check by sender address
-            pending_spend = sum(t.amount for t in self.pending_transactions 
-                              if pubkey_to_address.get(t.sender, t.sender) == sender_addr)
-            
-            print(f"Validated sender: {validated_tx.sender}")
-            print(f"Known public keys: {list(pubkey_to_address.keys())}")
-            print(f"Sender addr: {sender_addr}")
-            print(f"Balance: {self.get_balance(sender_addr)}")
-            print(f"Pending spend: {pending_spend}")
+            pending_spend = self._pending_by_sender.get(sender_addr, 0.0)
+            logging.debug("sender=%s balance=%s pending=%s",
+                          sender_addr, self.get_balance(sender_addr), pending_spend)
 
-            
             if self.get_balance(sender_addr) - pending_spend < tx.amount:
                 raise ValueError("Double-spend attempt detected in pending pool")
 
-            self.pending_transactions.append(tx)
+            # Canonicalize once here so downstream consumers skip the lookups
+            tx._sender_addr = sender_addr
+            tx._recipient_addr = pubkey_to_address.get(tx.recipient, tx.recipient)
+            self._add_pending(tx)
             logging.info(f"Transaction {tx.signature[:8]} added to pending pool.")
-            self.save_to_disk()
+            # No save here: the pending pool is not persisted, so nothing on disk changed
             return True
         except Exception as e:
             logging.warning(f"Transaction failed validation: {e}")
             return False
 
+    def _resolve_parties(self, transactions):
+        """Store each transaction's sender and recipient wallet addresses on it, once."""
+        pubkey_to_address = self._pubkey_to_address
+        for tx in transactions:
+            tx._sender_addr = pubkey_to_address.get(tx.sender, tx.sender)
+            tx._recipient_addr = pubkey_to_address.get(tx.recipient, tx.recipient)
+
+    def _add_pending(self, tx: Transaction):
+        """Add a transaction to the pending pool and count it against its sender."""
+        if tx._sender_addr is None:
+            self._resolve_parties([tx])
+        self.pending_transactions[tx.signature] = tx
+        self._pending_by_sender[tx._sender_addr] += tx.amount
+        self._pending_count_by_sender[tx._sender_addr] += 1
+
+    def _remove_pending(self, transactions):
+        """Drop the given transactions from the pending pool, keeping sender totals in step."""
+        pending = self.pending_transactions
+        for mined in transactions:
+            tx = pending.pop(mined.signature, None)
+            if tx is None:
+                continue
+            sender_addr = tx._sender_addr
+            self._pending_by_sender[sender_addr] -= tx.amount
+            self._pending_count_by_sender[sender_addr] -= 1
+            # Drop the total once the sender has nothing pending, rather than when it
+            # reaches <= 0, which float residue (e.g. 0.1 + 0.2 - 0.1 - 0.2) can miss
+            if self._pending_count_by_sender[sender_addr] <= 0:
+                del self._pending_by_sender[sender_addr]
+                del self._pending_count_by_sender[sender_addr]
+
     def mine_block(self, miner_identifier):
         """Mines a new block with exactly 1 transaction, rewards the miner, and updates the chain."""
         if not self.pending_transactions:
             logging.info("No transactions to mine.")
             return False
         
-        is_valid_chain, message = self.is_valid_chain()
-        if not is_valid_chain:
-            logging.error(f"Cannot mine block: Invalid chain - {message}")
-            return False
+        # Every block is validated on its way into the chain, so the full walk is
+        # only needed while the chain hasn't been validated yet (e.g. a bad load)
+        if not self._chain_validated:
+            is_valid_chain, message = self.is_valid_chain()
+            if not is_valid_chain:
+                logging.error(f"Cannot mine block: Invalid chain - {message}")
+                return False
+            self._chain_validated = True
 
         # Convert miner identifier to address if it's a public key
-        pubkey_to_address = {pub: addr for addr, pub in self.public_keys.items()}
+        pubkey_to_address = self._pubkey_to_address
         miner_address = pubkey_to_address.get(miner_identifier, miner_identifier)
         
         # Ensure we have a valid wallet address for the miner
@@ -169,7 +272,7 @@ class Blockchain(P2PNode, Persistence):
 
         last_block = self.get_latest_block()
         #select exactly 1 transaction for the block
-        selected_transaction = self.pending_transactions[0]
+        selected_transaction = next(iter(self.pending_transactions.values()))
         if not selected_transaction:
             logging.info("No valid transaction available for mining.")
             return False
@@ -188,25 +291,27 @@ class Blockchain(P2PNode, Persistence):
         except ValidationError as e:
             logging.error(f"Block validation failed: {e.messages}")
             return False  
+        # Check the new link only; the rest of the chain is already known to be valid
+        if not self.is_valid_block(validated_block, last_block):
+            return False
+        self._resolve_parties(validated_block.transactions)
         # Add the valid block to the chain
+        validated_block.seal()
         self.chain.append(validated_block)
 
 
-        # Remove ONLY the transaction that was actually mined
-        mined_user_transactions = [tx for tx in validated_block.transactions if tx.sender != "COINBASE"]
+        # Remove ONLY the transactions that were actually mined
+        mined_user_transactions = [tx for tx in validated_block.transactions if not tx.is_coinbase]
         if mined_user_transactions:
-            mined_tx = mined_user_transactions[0]  # Should be exactly 1
-            self.pending_transactions = [
-                tx for tx in self.pending_transactions 
-                if tx.signature != mined_tx.signature
-            ]
-            logging.info(f"Removed transaction {mined_tx.signature[:8]}... from mempool. {len(self.pending_transactions)} transactions remain.")
+            self._remove_pending(mined_user_transactions)
+            logging.info(f"Removed {len(mined_user_transactions)} mined transaction(s) from mempool. {len(self.pending_transactions)} transactions remain.")
 
-        self.rebuild_balances()
+        # Only the new block changed, so apply its delta instead of re-scanning the chain
+        self.apply_block_to_balances(validated_block)
 
         # Adjust difficulty for the next block
         self.difficulty = Consensus.adjust_difficulty(self.chain)
-        self.save_to_disk()
+        self.mark_dirty()
         logging.info(f"Block #{validated_block.height} mined successfully with 1 transaction by {miner_address[:10]}...")
         return validated_block
 
@@ -219,73 +324,183 @@ class Blockchain(P2PNode, Persistence):
         if block.previous_hash != previous_block.hash:
             logging.error(f"Invalid previous hash for block #{block.height}")
             return False
-        if not block.hash.startswith("0" * block.difficulty):
+        if not Consensus.valid_proof(block, block.difficulty):
             logging.error(f"Block #{block.height} does not meet difficulty requirement")
             return False
         if block.height != previous_block.height + 1:
             logging.error(f"Invalid block height for block #{block.height}")
             return False
+        if block.timestamp <= previous_block.timestamp:
+            logging.error(f"Invalid timestamp for block #{block.height}. Must be after previous block.")
+            return False
         return True
 
-    def is_valid_chain(self, chain=False):
+    def is_valid_chain(self, chain=False, rehash=False):
+        """
+        Validate the whole chain. With rehash=True every block is hashed from its
+        current fields, even sealed ones, so in-memory tampering is detected as well.
+        """
         chain = chain or self.chain
         if not chain:
             return False, "Empty chain"
         if chain[0].height != 0 or chain[0].previous_hash != "0":
             return False, "Invalid genesis block"
+        hashes = self._recompute_hashes(chain[1:], rehash)
         for i in range(1, len(chain)):
-            current = chain[i]
-            previous = chain[i-1]
-            if current.hash != current.calculate_hash():
-                return False, f"Invalid hash in block #{current.height}"
-            if current.previous_hash != previous.hash:
-                return False, f"Chain broken at block #{current.height}"
-            if not current.hash.startswith("0" * current.difficulty):
-                return False, f"Difficulty not met in block #{current.height}"
-            if current.height != previous.height + 1:
-                return False, f"Invalid height sequence at block #{current.height}"
-            if current.timestamp <= previous.timestamp:
-                return False,f"Invalid timestamp for block #{current.height}. Must be after previous block."
+            error = self._chain_link_error(chain[i], chain[i-1], hashes[i - 1])
+            if error:
+                return False, error
         return True, "OK"
 
+    def verify_chain_signatures(self, chain=False):
+        """
+        Check the signature of every non-coinbase transaction in the chain. The
+        checks are independent, so they are verified as one parallel batch.
+        """
+        chain = chain or self.chain
+        signed = [(block, tx) for block in chain for tx in block.transactions if not tx.is_coinbase]
+        results = verify_transactions([tx for _, tx in signed])
+        for (block, tx), valid in zip(signed, results):
+            if not valid:
+                return False, f"Invalid transaction signature in block #{block.height}"
+        return True, "OK"
+
+    def _chain_link_error(self, current, previous, current_hash):
+        """Return why current cannot follow previous in a chain, or None if it can."""
+        if current.hash != current_hash:
+            return f"Invalid hash in block #{current.height}"
+        if current.previous_hash != previous.hash:
+            return f"Chain broken at block #{current.height}"
+        if not Consensus.valid_proof(current, current.difficulty):
+            return f"Difficulty not met in block #{current.height}"
+        if current.height != previous.height + 1:
+            return f"Invalid height sequence at block #{current.height}"
+        if current.timestamp <= previous.timestamp:
+            return f"Invalid timestamp for block #{current.height}. Must be after previous block."
+        return None
+
+
+    def _recompute_hashes(self, blocks, rehash=False):
+        """
+        Recompute the hash of every given block (sealed ones from scratch if rehash).
+        Each hash is independent of the others, so long runs of blocks that need
+        hashing (e.g. a peer's chain) are spread across processes.
+        """
+        if rehash:
+            to_hash = len(blocks)
+        else:
+            to_hash = sum(1 for block in blocks if block._cached_hash is None)
+        workers = os.cpu_count() or 1
+        if to_hash < self.parallel_validation_min_blocks or workers < 2:
+            return [_block_hash(block, rehash) for block in blocks]
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context) as executor:
+            return list(executor.map(
+                _block_hash, blocks, itertools.repeat(rehash),
+                chunksize=max(1, len(blocks) // (4 * workers)),
+            ))
+
+    def _fetch_peer_chain(self, peer_url):
+        """
+        Stream a peer's chain and validate each block as it arrives, giving up at the
+        first invalid one. Returns the chain, or None if it was invalid or not longer
+        than ours (it could not replace ours either way).
+        """
+        ours = self.chain
+        # Blocks the peer shares with our validated chain are reused rather than re-hashed
+        shared = self._chain_validated
+        peer_chain = []
+        with self._http.get(f'{peer_url}/chain', timeout=5, stream=True) as response:
+            if response.status_code != 200:
+                return None
+            length = response.headers.get('X-Chain-Length')
+            if length is not None and int(length) <= len(ours):
+                return None
+            for block_data in _iter_chain_blocks(response):
+                height = len(peer_chain)
+                if shared and height < len(ours) and block_data.get('hash') == ours[height].hash:
+                    peer_chain.append(ours[height])
+                    continue
+                shared = False  # diverged (or past our tip): validate everything from here
+                block = Block.from_dict(block_data)
+                if peer_chain:
+                    error = self._chain_link_error(block, peer_chain[-1], block.calculate_hash())
+                elif block.height != 0 or block.previous_hash != "0":
+                    error = "Invalid genesis block"
+                else:
+                    error = None
+                if error:
+                    logging.warning(f"Rejected chain from peer {peer_url}: {error}")
+                    return None
+                peer_chain.append(block)
+        return peer_chain if len(peer_chain) > len(ours) else None
 
     def sync_chain(self):
         """Synchronizes the chain by fetching and validating chains from peers."""
         longest_chain = False
-        max_length = len(self.chain)
-
-        for peer_url in self.peers:
-            try:
-                response = requests.get(f'{peer_url}/chain')
-                if response.status_code == 200:
-                    data = response.json()
-                    length = data['length']
-                    if length > max_length:
-                        peer_chain = [Block.from_dict(b) for b in data['chain']]
-                        if self.is_valid_chain(peer_chain):
-                             max_length = length
-                             longest_chain = peer_chain
-            except requests.exceptions.RequestException as e:
-                logging.warning(f"Could not sync with peer {peer_url}: {e}")
+        peers = tuple(self.peers)  # immutable snapshot; add_peer may run concurrently
+        if not peers:
+            return
+
+        # Fetch and validate every peer's chain concurrently, keeping the longest valid one
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(32, len(peers))) as executor:
+            futures = {executor.submit(self._fetch_peer_chain, peer_url): peer_url for peer_url in peers}
+            for future in concurrent.futures.as_completed(futures):
+                peer_url = futures[future]
+                try:
+                    peer_chain = future.result()
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    logging.warning(f"Could not sync with peer {peer_url}: {e}")
+                    continue
+                if peer_chain and len(peer_chain) > len(longest_chain or self.chain):
+                    longest_chain = peer_chain
 
         if longest_chain:
+            # If the peer chain simply extends ours, only the new blocks need applying
+            extends_ours = all(
+                old.hash == new.hash for old, new in zip(self.chain, longest_chain)
+            )
+            old_length = len(self.chain)
+            for block in longest_chain:
+                block.seal()
+                self._resolve_parties(block.transactions)
             self.chain = longest_chain
-            self.rebuild_balances()
-            self.save_to_disk()
+            self._chain_validated = True
+            if extends_ours:
+                for block in self.chain[old_length:]:
+                    self.apply_block_to_balances(block)
+            else:
+                self.rebuild_balances()
+            self.mark_dirty()
             logging.info(f"Chain synchronized to length {len(self.chain)}")
 
+    def apply_block_to_balances(self, block: Block):
+        """Apply a single block's transactions to the current balances in place."""
+        self._apply_transactions(self.balances, block.transactions)
+
+    def _apply_transactions(self, balances, transactions):
+        """Debit senders and credit recipients of the given transactions in balances."""
+        # Transactions are normally resolved at ingress by _resolve_parties; fall back
+        # to the reverse map for any that were not
+        pubkey_to_address = self._pubkey_to_address
+        for tx in transactions:
+            # Debit the sender - only for non-COINBASE transactions
+            if not tx.is_coinbase:
+                sender_addr = tx._sender_addr or pubkey_to_address.get(tx.sender, tx.sender)
+                if sender_addr in balances:
+                    balances[sender_addr] -= tx.amount
+                else:
+                    logging.warning(f"  Unknown sender {sender_addr[:8]}... for debit of {tx.amount}")
+
+            # Credit the recipient
+            recipient_addr = tx._recipient_addr or pubkey_to_address.get(tx.recipient, tx.recipient)
+            balances[recipient_addr] += tx.amount
+
     def rebuild_balances(self):
         """Rebuild balances from the entire blockchain, handling both addresses and public keys."""
         logging.info("Starting balance rebuild...")
         
-        # Build mapping dictionaries for both directions
-        pubkey_to_address = {pub: addr for addr, pub in self.public_keys.items()}
-        address_to_pubkey = {addr: pub for addr, pub in self.public_keys.items()}
         logging.info(f"Address to public key mapping: {len(self.public_keys)} entries")
         
-        # Initialize all known wallet addresses with their original initial balances
-        self.balances.clear()
-        
         # Ensure we have initial_wallet_balances attribute
         if not hasattr(self, 'initial_wallet_balances'):
             self.initial_wallet_balances = {}
@@ -293,70 +508,15 @@ class Blockchain(P2PNode, Persistence):
             for address in self.wallets.keys():
                 self.initial_wallet_balances[address] = 100.0
         
-        for address in self.wallets.keys():
-            initial_balance = self.initial_wallet_balances.get(address, 100.0)
-            self.balances[address] = initial_balance
-            logging.info(f"  Initialized {address[:8]}... with initial balance {initial_balance}")
-        
-        # Process all transactions in the blockchain
-        for block in self.chain:
-            logging.info(f"Processing block #{block.height} with {len(block.transactions)} transactions")
-            for tx in block.transactions:
-                
-                # Handle sender (debit) - only for non-COINBASE transactions
-                if tx.sender != "COINBASE":
-                    # Convert sender (usually public key) to address
-                    sender_addr = pubkey_to_address.get(tx.sender, tx.sender)
-                    if sender_addr in self.balances:
-                        old_balance = self.balances[sender_addr]
-                        self.balances[sender_addr] = old_balance - tx.amount
-                        logging.info(f"  Deducted {tx.amount} from {sender_addr[:8]}... (was {old_balance}, now {self.balances[sender_addr]})")
-                    else:
-                        logging.warning(f"  Unknown sender {sender_addr[:8]}... for debit of {tx.amount}")
-                
-                # Handle recipient (credit) - for all transactions
-                recipient_addr = False
-                
-                if tx.sender == "COINBASE":
-                    # For COINBASE, recipient should be an address (mining reward)
-                    if tx.recipient in self.wallets:
-                        # Recipient is an address
-                        recipient_addr = tx.recipient
-                        logging.info(f"  COINBASE recipient is wallet address: {recipient_addr[:8]}...")
-                    elif tx.recipient in pubkey_to_address:
-                        # Recipient is a public key, convert to address
-                        recipient_addr = pubkey_to_address[tx.recipient]
-                        logging.info(f"  COINBASE recipient converted from pubkey to address: {recipient_addr[:8]}...")
-                    else:
-                        # Unknown recipient - might be external address
-                        recipient_addr = tx.recipient
-                        logging.warning(f"  Unknown COINBASE recipient {tx.recipient[:8]}...")
-                else:
-                    # For regular transactions, recipient is usually a public key
-                    if tx.recipient in pubkey_to_address:
-                        # Recipient is a public key, convert to address
-                        recipient_addr = pubkey_to_address[tx.recipient]
-                        logging.info(f"  Regular transaction recipient converted from pubkey to address: {recipient_addr[:8]}...")
-                    elif tx.recipient in self.wallets:
-                        # Recipient is an address
-                        recipient_addr = tx.recipient
-                        logging.info(f"  Regular transaction recipient is wallet address: {recipient_addr[:8]}...")
-                    else:
-                        # Unknown recipient
-                        recipient_addr = tx.recipient
-                        logging.warning(f"  Unknown transaction recipient {tx.recipient[:8]}...")
-                
-                # Credit the recipient
-                if recipient_addr:
-                    old_balance = self.balances.get(recipient_addr, 0)
-                    self.balances[recipient_addr] = old_balance + tx.amount
-                    logging.info(f"  Credited {tx.amount} to {recipient_addr[:8]}... (was {old_balance}, now {self.balances[recipient_addr]})")
-        
-        # Final cleanup: ensure all wallets have entries
-        for address in self.wallets.keys():
-            if address not in self.balances:
-                initial_balance = self.initial_wallet_balances.get(address, 100.0)
-                self.balances[address] = initial_balance
-                logging.info(f"  Restored missing balance for {address[:8]}... to {initial_balance}")
+        # Accumulate into a local dict seeded with every wallet's initial balance,
+        # then write it back once at the end
+        balances = collections.defaultdict(float, {
+            address: self.initial_wallet_balances.get(address, 100.0)
+            for address in self.wallets.keys()
+        })
+        # Process all transactions in the blockchain as one flat stream
+        transactions = itertools.chain.from_iterable(block.transactions for block in self.chain)
+        self._apply_transactions(balances, transactions)
         
-        logging.info(f"Balance rebuild complete. Final balances: {self.balances}")
\ No newline at end of file
+        self.balances = balances
+        logging.info(f"Balance rebuild complete. Final balances: {self.balances}")
@@ -1,13 +1,53 @@
-import json
+import os
+import hashlib
+import itertools
+import multiprocessing
 import time
+import concurrent.futures
 from models import Block
 from transaction import Transaction
 
+# Worker processes must not be forked from this multithreaded process (Flask, queue and
+# broadcaster threads): a child can inherit a lock held mid-operation and deadlock.
+# forkserver starts them from a clean single-threaded server; spawn where it isn't available.
+_mp_context = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+_stop_mining = None  # Event shared by parallel mining workers, set by whichever finds a nonce
+
+
+def _init_pow_worker(stop):
+    global _stop_mining
+    _stop_mining = stop
+
+
+def _pow_worker(prefix: bytes, suffix: bytes, difficulty: int, start: int, stride: int, batch: int = 1 << 13):
+    """
+    Search one progression of nonce groups in batches, checking between batches
+    whether another worker has already succeeded. Returns (nonce, digest) or None.
+    """
+    while not _stop_mining.is_set():
+        found = Consensus._pow_inner(prefix, suffix, difficulty, start, stride, batch)
+        if found:
+            _stop_mining.set()
+            return found
+        start += stride * batch
+    return None
+
+
 class Consensus:
+    _difficulty_prefixes = {}  # difficulty -> "0" * difficulty, built once per difficulty
+    # Below this difficulty a block is found faster than a process pool can start
+    parallel_min_difficulty = 6
+
     @staticmethod
     def valid_proof(block: Block, difficulty: int) -> bool:
         """Check if a block's hash meets the difficulty requirement."""
-        return block.hash.startswith("0" * difficulty)
+        prefix = Consensus._difficulty_prefixes.get(difficulty)
+        if prefix is None:
+            prefix = Consensus._difficulty_prefixes[difficulty] = "0" * difficulty
+        return block.hash.startswith(prefix)
 
     @staticmethod
     def proof_of_work(last_block: Block, transactions, miner_address, difficulty: int, base_reward=10):
@@ -17,7 +57,9 @@ class Consensus:
         """
         height = last_block.height + 1
         previous_hash = last_block.hash
-        timestamp = int(time.time())
+        # Blocks must be strictly later than their parent; fast mining can finish
+        # several blocks within the same second
+        timestamp = max(int(time.time()), last_block.timestamp + 1)
         adjusted_reward = base_reward * difficulty
         # Add mining reward transaction
         reward_tx = Transaction(
@@ -39,27 +81,72 @@ class Consensus:
             timestamp=timestamp
         )
 
-        # Proof-of-work loop
-        while True:
-            block.hash = block.calculate_hash()
+        # Hash everything before the nonce once; each attempt only hashes the rest
+        prefix, suffix = block.hash_preimage_parts()
+        workers = os.cpu_count() or 1
+        if difficulty >= Consensus.parallel_min_difficulty and workers > 1:
+            block.nonce, digest = Consensus._pow_parallel(prefix, suffix, difficulty, workers)
+        else:
+            block.nonce, digest = Consensus._pow_inner(prefix, suffix, difficulty)
+        block.hash = digest.hex()
+        return block
 
-            # Debug print to see the block string and hash for each nonce:
-            block_string = json.dumps({
-                'mined_by': block.mined_by,
-                'transactions': [tx if isinstance(tx, dict) else tx.to_dict(include_signature=True) for tx in block.transactions],
-                'height': block.height,
-                'difficulty': block.difficulty,
-                'previous_hash': block.previous_hash,
-                'nonce': block.nonce,
-                'timestamp': block.timestamp,
-                'merkle_root': block.merkle_root
-            }, sort_keys=True)
+    @staticmethod
+    def _pow_parallel(prefix: bytes, suffix: bytes, difficulty: int, workers: int):
+        """
+        Mine on every core: worker k tries nonce groups k, k + workers, k + 2 * workers, ...
+        (see _pow_inner) so the searches never overlap. Returns the first (nonce, digest) found.
+        """
+        stop = _mp_context.Event()
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, mp_context=_mp_context, initializer=_init_pow_worker, initargs=(stop,)
+        ) as executor:
+            futures = [
+                executor.submit(_pow_worker, prefix, suffix, difficulty, k, workers)
+                for k in range(workers)
+            ]
+            for future in concurrent.futures.as_completed(futures):
+                found = future.result()
+                if found:
+                    stop.set()
+                    return found
 
-            print(f"[Mining] Nonce: {block.nonce} Hash: {block.hash}")
-            print(f"[Mining] Block String for hash:\n{block_string}\n")
-            if Consensus.valid_proof(block, difficulty):
-                return block
-            block.nonce += 1   
+    @staticmethod
+    def _pow_inner(prefix: bytes, suffix: bytes, difficulty: int, start: int = 0, stride: int = 1, attempts=None):
+        """
+        Search nonce groups start, start + stride, ... until the digest of
+        prefix + nonce + suffix meets the difficulty. Group g holds the ten nonces
+        10 * g .. 10 * g + 9, which share every decimal digit but the last: the
+        SHA-256 state after prefix + those leading digits is computed once per group
+        and copied for each final digit, whose bytes are prebuilt together with the suffix.
+        Scanning from group 0 with stride 1 tries nonces 0, 1, 2, ... in order.
+        Returns (nonce, digest), or None if `attempts` groups were tried without success.
+        """
+        # A digest has `difficulty` leading zero hex digits exactly when, read as a
+        # big-endian number, it is below 16 ** (64 - difficulty). Equal-length bytes
+        # compare lexicographically, i.e. numerically, so one compare does the check.
+        if difficulty <= 0:
+            bound = b"\xff" * 33  # longer than any digest, so every digest is below it
+        else:
+            bound = (1 << (256 - 4 * difficulty)).to_bytes(32, "big")
+        base = hashlib.sha256(prefix)
+        tails = [b"%d" % digit + suffix for digit in range(10)]
+        if attempts is None:
+            groups = itertools.count(start, stride)
+        else:
+            groups = range(start, start + attempts * stride, stride)
+        for group in groups:
+            head = base.copy()
+            if group:  # group 0's nonces are the single digits 0-9
+                head.update(b"%d" % group)
+            copy = head.copy
+            for digit, tail in enumerate(tails):
+                h = copy()
+                h.update(tail)
+                digest = h.digest()
+                if digest < bound:
+                    return 10 * group + digit, digest
+        return None
 
     @staticmethod
     def adjust_difficulty(chain, target_block_time=10, adjustment_interval=10, min_difficulty=1):
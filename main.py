@@ -1,14 +1,509 @@
+import re
 import sys
+import math
 import threading
 import time
+import concurrent.futures
+import atexit
 import logging
-from blockchain import Blockchain
 from transaction import Transaction
-from nacl.encoding import HexEncoder
-from nacl.signing import SigningKey
 
-# Configure logging for seeing the P2P messages
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Configure logging for seeing the P2P messages. The raw epoch timestamp avoids a
+# strftime call per record that %(asctime)s would cost.
+logging.basicConfig(level=logging.INFO, format='%(created).3f - %(levelname)s - %(message)s')
+
+# The main menu, written out in a single call each time it is shown
+MENU = (
+    "\n=== BLOCKCHAIN SIMULATION CLI ===\n"
+    "1. Create wallet\n"
+    "2. Create transaction\n"
+    "3. Mine block\n"
+    "4. View node\n"
+    "5. Check balance\n"
+    "6. View all wallets\n"
+    "7. Faucet (add test funds)\n"
+    "8.  Difficulty Adjustment Test\n"
+    "9.  Run tests immutability\n"
+    "10. View pending transactions\n"
+    "11. Exit\n"
+)
+
+# Addresses and public keys are 64 hex characters; checked at input, before any crypto runs
+_HEX64 = re.compile(r'[0-9a-fA-F]{64}').fullmatch
+
+# Per-wallet menu lines, formatted through prebuilt templates and written in one call
+WALLET_LINE = "{i}. {short}... (Balance: {bal} coins)\n".format
+WALLET_SHORT_LINE = "{i}. {short}... : {bal} coins\n".format
+
+# Transactions created at the prompt are sent to peers in batches: at most every
+# BROADCAST_INTERVAL seconds, or as soon as BROADCAST_BATCH_SIZE are waiting
+BROADCAST_INTERVAL = 0.2
+BROADCAST_BATCH_SIZE = 50
+_pending_broadcast = []
+_pending_broadcast_lock = threading.Lock()
+
+# Number of blocks the chain explorer shows per page
+EXPLORER_PAGE_SIZE = 10
+
+# Wallet lists (and their 16-character display prefixes) reused across menu
+# iterations until a wallet is created
+_wallet_cache = {"version": -1, "items": (), "keys": (), "short": {}}
+
+# Last explorer listing, reused while the chain tip and the requested window are unchanged
+_view_cache = {"key": None, "text": ""}
+
+def queue_broadcast(node, tx):
+    """Queue a transaction for the next batched broadcast, flushing early once the batch is full."""
+    with _pending_broadcast_lock:
+        _pending_broadcast.append(tx)
+        full = len(_pending_broadcast) >= BROADCAST_BATCH_SIZE
+    if full:
+        flush_broadcast(node)
+
+
+def flush_broadcast(node):
+    """Broadcast every queued transaction in one batch; returns the per-peer futures."""
+    with _pending_broadcast_lock:
+        batch = _pending_broadcast[:]
+        _pending_broadcast.clear()
+    if not batch:
+        return []
+    return node.broadcast_transactions(batch)
+
+
+def _broadcast_flusher(node):
+    """Background loop sending queued transactions every BROADCAST_INTERVAL seconds."""
+    while True:
+        time.sleep(BROADCAST_INTERVAL)
+        flush_broadcast(node)
+
+
+def read_line(prompt):
+    """
+    Write a prompt and read one line from stdin, like input() but through the
+    same buffered write/readline path as the main menu. Raises EOFError at end of input.
+    """
+    sys.stdout.write(prompt)
+    sys.stdout.flush()
+    line = sys.stdin.readline()
+    if not line:
+        raise EOFError("EOF when reading a line")
+    return line.rstrip("\n")
+
+
+def parse_num(raw, default=None):
+    """Parse a user-entered amount, returning default for anything that is not a finite number."""
+    try:
+        value = float(raw)
+    except ValueError:
+        return default
+    # float() also accepts "nan" and "inf", which would slip past an `amount <= 0` check
+    return value if math.isfinite(value) else default
+
+
+def wallets_snapshot(node):
+    """Return the cached (address, private key) items, addresses and short addresses of the node's wallets."""
+    if node._wallet_version != _wallet_cache["version"]:
+        _wallet_cache["items"] = tuple(node.wallets.items())
+        _wallet_cache["keys"] = tuple(node.wallets.keys())
+        _wallet_cache["short"] = {addr: addr[:16] for addr in _wallet_cache["keys"]}
+        _wallet_cache["version"] = node._wallet_version
+    return _wallet_cache
+
+
+def pick_wallet(node, prompt, line=WALLET_LINE,
+                invalid="Invalid wallet selection", not_a_number="Invalid input"):
+    """
+    List the node's wallets with their balances and read a 1-based selection.
+    Returns (address, balances by address); address is None if the selection was
+    invalid, after printing the matching message.
+    """
+    wallets = wallets_snapshot(node)
+    wallet_list, short = wallets["keys"], wallets["short"]
+    # Look each balance up once per listing; callers reuse it
+    wallet_balances = {addr: node.get_balance(addr) for addr in wallet_list}
+    sys.stdout.write("".join([
+        line(i=i, short=short[addr], bal=wallet_balances[addr])
+        for i, addr in enumerate(wallet_list, 1)
+    ]))
+    try:
+        index = int(read_line(prompt.format(count=len(wallet_list))).strip()) - 1
+    except ValueError:
+        print(not_a_number)
+        return None, wallet_balances
+    if not 0 <= index < len(wallet_list):
+        print(invalid.format(count=len(wallet_list)))
+        return None, wallet_balances
+    return wallet_list[index], wallet_balances
+
+
+def handle_create_wallet(node):
+    """Create a new wallet with an optional initial balance."""
+    # Create wallet
+    initial_balance = read_line("Enter initial balance (default 100): ").strip()
+    balance = parse_num(initial_balance, default=100.0)
+        
+    address, private_key_hex, public_key_hex = node.create_wallet(initial_balance=balance)
+    print(f"\nNew wallet created!")
+    print(f"Address: {address}")
+    print(f"Private Key: {private_key_hex}")
+    print(f"Public Key: {public_key_hex}")
+    print(f"Initial balance: {node.get_balance(address)} coins")
+
+
+def handle_create_transaction(node):
+    """Sign a transaction from one of our wallets, add it to the pool and broadcast it."""
+    # Create transaction
+    if not node.wallets:
+        print("No wallets available. Create a wallet first.")
+        return
+        
+    print("\nCreate Transaction")
+    print("\nAvailable wallets:")
+    # Select sender
+    sender_addr, wallet_balances = pick_wallet(
+        node, "Select sender wallet (1-{count}): ",
+        invalid="Invalid wallet number. Please enter 1-{count}",
+        not_a_number="Invalid input. Please enter a number.",
+    )
+    if sender_addr is None:
+        return
+    sender_priv = node.get_signing_key(sender_addr)
+    sender_pub = node.public_keys.get(sender_addr)
+    short = wallets_snapshot(node)["short"]
+        
+    print(f"Sender: {short[sender_addr]}... (Balance: {wallet_balances[sender_addr]} coins)")
+    
+    # Get recipient address
+    recipient_addr = read_line("\nEnter recipient address (64 hex characters): ").strip()
+    if not _HEX64(recipient_addr):
+        print("Invalid address format. Must be exactly 64 hexadecimal characters.")
+        return
+    
+    # For transactions, recipient should be the public key, not address
+    # Check if this is one of our wallets (then use public key), otherwise use the address as-is
+    recipient_pub = node.public_keys.get(recipient_addr, recipient_addr)
+    
+    # Get amount
+    amount = parse_num(read_line("Enter amount to send: "))
+    if amount is None:
+        print("Invalid amount")
+        return
+    if amount <= 0:
+        print("Amount must be positive")
+        return
+    
+    # Create and sign transaction
+    tx = Transaction(sender=sender_pub, recipient=recipient_pub, amount=amount)
+    tx.sign(sender_priv)
+    
+    # Add to node
+    if node.add_transaction(tx):
+        print("Transaction added to pending pool!")
+        print(f"Transaction hash: {tx.signature[:16]}...")
+        print(f"From: {short[sender_addr]}...")
+        print(f"To: {recipient_addr[:16]}...")
+        print(f"Amount: {amount} coins")
+        
+        # Queue for the next batched broadcast to the network
+        queue_broadcast(node, tx)
+    else:
+        print("Transaction failed validation")
+
+
+def handle_mine_block(node):
+    """Mine the next pending transaction with a chosen miner wallet and broadcast the block."""
+    # Mine block
+    if not node.pending_transactions:
+        print("No pending transactions to mine")
+        return
+        
+    if not node.wallets:
+        print("No wallets available. Create a wallet first.")
+        return
+        
+    print(f"\n Mining Block ({len(node.pending_transactions)} pending transactions)")
+    
+    # Show current mempool
+    for i, tx in enumerate(node.pending_transactions.values(), 1):
+        print(f"   {i}. {tx.sender[:16]}... → {tx.recipient[:16]}... : {tx.amount} coins")
+    
+    # Select miner wallet
+    print("\nSelect miner wallet:")
+    miner_addr, _ = pick_wallet(node, "Select miner wallet (number): ")
+    if miner_addr is None:
+        return
+    miner_pub = node.public_keys.get(miner_addr)
+        
+    print(f" Mining with difficulty {node.difficulty}...")
+    
+    # Peers should have every queued transaction before they see the block
+    flush_broadcast(node)
+
+    start_time = time.time()
+    block = node.mine_block(miner_pub)
+    end_time = time.time()
+    
+    if block:
+        # One pass, stopping at the reward transaction; the user transactions aren't shown here
+        mining_reward = next((tx.amount for tx in block.transactions if tx.is_coinbase), 0)
+        
+        print(f"Block #{block.height} mined successfully!")
+        print(f"  Time: {end_time - start_time:.2f}s")
+        print(f" Hash: {block.hash[:16]}...")
+        print(f" Mining reward: {mining_reward} coins")
+        print(f" Remaining in mempool: {len(node.pending_transactions)}")
+        
+        node.broadcast_block(block)
+    else:
+        print("Mining failed")
+
+
+def handle_view_chain(node):
+    """Print one page of the chain (the latest blocks by default) or the whole chain."""
+    chain = node.chain
+    page = read_line(f"Page (Enter for latest {EXPLORER_PAGE_SIZE}, 'a' for all): ").strip().lower()
+    if page == 'a':
+        start, stop = 0, len(chain)
+    else:
+        try:
+            page_number = int(page) if page else 1
+        except ValueError:
+            print("Invalid page")
+            return
+        if page_number < 1:
+            print("Invalid page")
+            return
+        # Page 1 is the newest blocks; blocks within a page stay in chain order
+        stop = max(0, len(chain) - (page_number - 1) * EXPLORER_PAGE_SIZE)
+        start = max(0, stop - EXPLORER_PAGE_SIZE)
+        if start >= stop:
+            print(f"No blocks on page {page_number}")
+            return
+
+    # Same tip, length and window as last time: the listing cannot have changed
+    key = (chain[-1].hash if chain else None, len(chain), start, stop)
+    if _view_cache["key"] == key:
+        sys.stdout.write(_view_cache["text"])
+        return
+
+    # View node - build the listing for the window only, then write it out in one call
+    out = [f"\nNode Explorer ({len(chain)} blocks, showing #{start}-#{stop - 1})", "=" * 60]
+    append, ctime = out.append, time.ctime  # bound once for the per-block loop
+    
+    for block in chain[start:stop]:
+        append(f"\nBlock #{block.height}")
+        append(f"   Hash: {block.hash}")
+        append(f"   Previous: {block.previous_hash}")
+        append(f"   Timestamp: {ctime(block.timestamp)}")
+        append(f"   Difficulty: {block.difficulty}")
+        append(f"   Nonce: {block.nonce}")
+        append(f"   Mined by: {block.mined_by[:16] if len(block.mined_by) > 16 else block.mined_by}...")
+        append(f"   Merkle root: {block.merkle_root}")
+        
+        if block.transactions:
+            append(f"   Transactions ({len(block.transactions)}):")
+            for i, tx in enumerate(block.transactions, 1):
+                if tx.is_coinbase:
+                    append(f"     {i}.COINBASE → {tx.recipient[:16]}... : {tx.amount} coins (reward)")
+                else:
+                    append(f"     {i}. {tx.sender[:16]}... → {tx.recipient[:16]}... : {tx.amount} coins")
+        else:
+            append("   Transactions: None (Genesis block)")
+        append("-" * 60)
+    text = "\n".join(out) + "\n"
+    _view_cache["key"], _view_cache["text"] = key, text
+    sys.stdout.write(text)
+
+
+def handle_check_balance(node):
+    """Show one wallet's balance."""
+    # Check balance
+    if not node.wallets:
+        print("No wallets available. Create a wallet first.")
+        return
+        
+    print("\nBalance Checker")
+    address, wallet_balances = pick_wallet(node, "Select wallet to check (number): ", line=WALLET_SHORT_LINE)
+    if address is None:
+        return
+            
+    print(f"\n Wallet Details:")
+    print(f"Address: {address}")
+    print(f"Balance: {wallet_balances[address]} coins")
+
+
+def handle_view_wallets(node):
+    """Print every wallet with its balance and public key."""
+    # View all wallets
+    if not node.wallets:
+        print("No wallets available.")
+        return
+        
+    out = [f"\n All Wallets ({len(node.wallets)} total)", "=" * 70]
+    # Bind the per-wallet lookups once instead of resolving them on every iteration
+    append, get_balance, public_keys = out.append, node.get_balance, node.public_keys
+    
+    for i, (addr, priv_key) in enumerate(wallets_snapshot(node)["items"], 1):
+        balance = get_balance(addr)
+        pub_key = public_keys.get(addr, "Unknown")
+        
+        append(f"\nWallet #{i}")
+        append(f"   Address: {addr}")
+        append(f"   Balance: {balance} coins")
+        append(f"   Public Key: {pub_key}")
+        append("-" * 70)
+    sys.stdout.write("\n".join(out) + "\n")
+
+
+def handle_faucet(node):
+    """Add test funds to a wallet."""
+    # Add funds (testing)
+    print("\n Add Test Funds")
+    
+    if not node.wallets:
+        print("No wallets available. Create a wallet first.")
+        return
+        
+    address, _ = pick_wallet(node, "Select wallet to fund (number): ", line=WALLET_SHORT_LINE)
+    if address is None:
+        return
+            
+    amount = parse_num(read_line("Enter amount to add: "))
+    if amount is None:
+        print("Invalid input")
+        return
+    if amount <= 0:
+        print("Amount must be positive")
+        return
+        
+    # Add funds
+    node.balances[address] += amount
+    node.mark_dirty()
+    
+    print(f"Added {amount} coins to {wallets_snapshot(node)['short'][address]}...")
+    print(f"New balance: {node.get_balance(address)} coins")
+
+
+def handle_difficulty_test(node):
+    """Mine several blocks quickly to demonstrate difficulty adjustment."""
+    # Basic tests + Difficulty Adjustment Test
+    # Test difficulty adjustment
+    print("\n🔧 Testing Difficulty Adjustment...")
+    
+    # Show current state
+    current_difficulty = node.difficulty
+    chain_length = len(node.chain)
+    print(f"Current difficulty: {current_difficulty}")
+    print(f"Current chain length: {chain_length} blocks")
+    
+    if not node.wallets:
+        print("Creating test wallet for mining...")
+        test_addr, test_priv, test_pub = node.create_wallet(initial_balance=1000)
+        print(f"Created test wallet: {test_addr[:16]}...")
+    else:
+        # Use first available wallet
+        test_addr = wallets_snapshot(node)["keys"][0]
+        test_pub = node.public_keys[test_addr]
+    test_priv_key = node.get_signing_key(test_addr)
+    
+    # Create multiple test transactions if mempool is empty
+    if not node.pending_transactions:
+        print("Creating test transactions for mining...")
+        for i in range(3):
+            # Create self-transactions for testing
+            test_tx = Transaction(sender=test_pub, recipient=test_pub, amount=1)
+            test_tx.sign(test_priv_key)
+            node.add_transaction(test_tx)
+        print(f"Created {len(node.pending_transactions)} test transactions")
+    
+    # Mine several blocks quickly to trigger difficulty adjustment
+    print("\n Mining blocks to demonstrate difficulty adjustment...")
+    blocks_to_mine = 5
+    
+    for i in range(blocks_to_mine):
+        if not node.pending_transactions:
+            # Create another test transaction
+            test_tx = Transaction(sender=test_pub, recipient=test_pub, amount=1)
+            test_tx.sign(test_priv_key)
+            node.add_transaction(test_tx)
+        
+        print(f"\n--- Mining Block {i+1}/{blocks_to_mine} ---")
+        old_difficulty = node.difficulty
+        
+        start_time = time.time()
+        block = node.mine_block(test_pub)
+        end_time = time.time()
+        
+        if block:
+            new_difficulty = node.difficulty
+            
+            if new_difficulty != old_difficulty:
+                if new_difficulty > old_difficulty:
+                    print(f"   🔼 Difficulty INCREASED (blocks mined too fast)")
+                else:
+                    print(f"   🔽 Difficulty DECREASED (blocks mined too slow)")
+            else:
+                print(f"   ➖ Difficulty unchanged")
+        else:
+            print(f" Mining failed for block {i+1}")
+            break
+    
+    # Build the summary and write it out in one call
+    out = [
+        f"\n📊 Difficulty Adjustment Summary:",
+        f"   Starting difficulty: {current_difficulty}",
+        f"   Final difficulty: {node.difficulty}",
+        f"   Chain length: {len(node.chain)} blocks",
+        f"   Adjustment triggered: {'Yes' if node.difficulty != current_difficulty else 'No'}",
+    ]
+    
+    # Show recent block times
+    if len(node.chain) >= 3:
+        out.append(f"\n⏰ Recent Block Times:")
+        recent_blocks = node.chain[-3:]
+        for i in range(1, len(recent_blocks)):
+            prev_block = recent_blocks[i-1]
+            curr_block = recent_blocks[i]
+            time_diff = curr_block.timestamp - prev_block.timestamp
+            out.append(f"   Block #{curr_block.height}: {time_diff}s after previous")
+    sys.stdout.write("\n".join(out) + "\n")
+
+
+def handle_validate_chain(node):
+    """Check that the chain is still valid, including every transaction signature."""
+    # Re-hash every block from its current fields rather than trusting sealed hashes
+    is_valid_chain, message = node.is_valid_chain(rehash=True)
+    if is_valid_chain:
+        is_valid_chain, message = node.verify_chain_signatures()
+    if is_valid_chain:
+        print("✅ Blockchain is valid!")
+    else:
+        print(f"❌ Blockchain is invalid: {message}")
+
+
+def handle_view_pending(node):
+    """Print the pending transaction pool."""
+    # Show current mempool
+    print("\nCurrent Pending Transactions:")
+    for i, tx in enumerate(node.pending_transactions.values(), 1):
+        print(f"   {i}. {tx.sender[:16]}... → {tx.recipient[:16]}... : {tx.amount} coins")
+
+
+# Menu choice -> handler; '11' (exit) is handled by the loop itself
+HANDLERS = {
+    '1': handle_create_wallet,
+    '2': handle_create_transaction,
+    '3': handle_mine_block,
+    '4': handle_view_chain,
+    '5': handle_check_balance,
+    '6': handle_view_wallets,
+    '7': handle_faucet,
+    '8': handle_difficulty_test,
+    '9': handle_validate_chain,
+    '10': handle_view_pending,
+}
+
 
 def main():
     """Complete CLI interface for interacting with the node."""
@@ -19,404 +514,69 @@ def main():
         print("Example (second node, connects to first): python main.py 5001 5000")
         sys.exit(1)
 
+    # Imported here so a usage error returns before Flask/SocketIO/eventlet load
+    from blockchain import Blockchain
+
     port = int(sys.argv[1])
     host = '127.0.0.1'
     peer_ports = sys.argv[2:]
+    peer_urls = [f"http://{host}:{peer_p}" for peer_p in peer_ports]
 
    # initialization single node
     print(f" Initializing node node on port {port}...")
     # This is our single node instance
     node = Blockchain(host=host, port=port)
+    # Deferred saves must still reach disk if the CLI dies on Ctrl-C or an error
+    atexit.register(node.flush)
 
     # start the server in a background thread
     # This is crucial because it runs the network listener without blocking the CLI.
     server_thread = threading.Thread(target=node.run, daemon=True)
     server_thread.start()
+    # Wait until the listener is bound rather than sleeping a fixed worst case
+    node.ready.wait(timeout=5)
     print(f" Node server running in background at http://{host}:{port}")
 
-    # connect to any specified peer nodes
-    for peer_p in peer_ports:
-        peer_url = f"http://{host}:{peer_p}"
-        node.connect_to_peer(peer_url)
+    # connect to any specified peer nodes, overlapping the handshakes
+    if peer_urls:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(32, len(peer_urls))) as pool:
+            list(pool.map(node.connect_to_peer, peer_urls))
     
-    # Give the server a moment to start and connect
-    time.sleep(2)
+    threading.Thread(target=_broadcast_flusher, args=(node,), daemon=True).start()
     print(" node CLI is ready!")
 
     # run CLI
     # The `node` variable is now `node`.
 
+    prompt = MENU + f"Node@{port}> "
     while True:
-        print("\n=== BLOCKCHAIN SIMULATION CLI ===")
-        print("1. Create wallet")
-        print("2. Create transaction")
-        print("3. Mine block")
-        print("4. View node")
-        print("5. Check balance")
-        print("6. View all wallets")
-        print("7. Faucet (add test funds)")
-        print("8.  Difficulty Adjustment Test")
-        print("9.  Run tests immutability")
-        print("10. View pending transactions")
-        print("11. Exit")
-        
+        # One write for the menu and prompt, then read the reply straight from stdin
+        sys.stdout.write(prompt)
+        sys.stdout.flush()
         try:
-            choice = input(f"Node@{port}> ").strip()
-        except (EOFError, KeyboardInterrupt):
+            line = sys.stdin.readline()
+        except KeyboardInterrupt:
+            line = ""
+        if not line:
             print("\nExiting...")
             break
+        choice = line.strip()
 
-        if choice == '1':
-            # Create wallet
-            try:
-                initial_balance = input("Enter initial balance (default 100): ").strip()
-                balance = float(initial_balance) if initial_balance else 100.0
-            except ValueError:
-                balance = 100.0
-                
-            address, private_key_hex, public_key_hex = node.create_wallet(initial_balance=balance)
-            print(f"\nNew wallet created!")
-            print(f"Address: {address}")
-            print(f"Private Key: {private_key_hex}")
-            print(f"Public Key: {public_key_hex}")
-            print(f"Initial balance: {node.get_balance(address)} coins")
-
-        elif choice == '2':
-            # Create transaction
-            if not node.wallets:
-                print("No wallets available. Create a wallet first.")
-                continue
-                
-            print("\nCreate Transaction")
-            print("\nAvailable wallets:")
-            wallet_list = list(node.wallets.items())
-            for i, (addr, _) in enumerate(wallet_list, 1):
-                balance = node.get_balance(addr)
-                print(f"{i}. {addr[:16]}... (Balance: {balance} coins)")
-            
-            # Select sender
-            try:
-                sender_choice = input(f"Select sender wallet (1-{len(wallet_list)}): ").strip()
-                sender_idx = int(sender_choice) - 1
-                if 0 <= sender_idx < len(wallet_list):
-                    sender_addr, sender_priv_hex = wallet_list[sender_idx]
-                    sender_priv = SigningKey(sender_priv_hex, encoder=HexEncoder)
-                    sender_pub = node.public_keys.get(sender_addr)
-                else:
-                    print(f"Invalid wallet number. Please enter 1-{len(wallet_list)}")
-                    continue
-            except ValueError:
-                print("Invalid input. Please enter a number.")
-                continue
-                
-            print(f"Sender: {sender_addr[:16]}... (Balance: {node.get_balance(sender_addr)} coins)")
-            
-            # Get recipient address
-            recipient_addr = input("\nEnter recipient address (64 hex characters): ").strip()
-            if len(recipient_addr) != 64:
-                print("Invalid address format. Must be exactly 64 hexadecimal characters.")
-                continue
-            
-            # For transactions, recipient should be the public key, not address
-            # Check if this is one of our wallets (then use public key), otherwise use the address as-is
-            recipient_pub = node.public_keys.get(recipient_addr, recipient_addr)
-            
-            # Get amount
-            try:
-                amount = float(input("Enter amount to send: "))
-                if amount <= 0:
-                    print("Amount must be positive")
-                    continue
-            except ValueError:
-                print("Invalid amount")
-                continue
-            
-            # Create and sign transaction
-            tx = Transaction(sender=sender_pub, recipient=recipient_pub, amount=amount)
-            tx.sign(sender_priv)
-            
-            # Add to node
-            if node.add_transaction(tx):
-                print("Transaction added to pending pool!")
-                print(f"Transaction hash: {tx.signature[:16]}...")
-                print(f"From: {sender_addr[:16]}...")
-                print(f"To: {recipient_addr[:16]}...")
-                print(f"Amount: {amount} coins")
-                
-                # Broadcast to network
-                node.broadcast_transaction(tx)
-            else:
-                print("Transaction failed validation")
-
-
-        elif choice == '3':
-            # Mine block
-            if not node.pending_transactions:
-                print("No pending transactions to mine")
-                continue
-                
-            if not node.wallets:
-                print("No wallets available. Create a wallet first.")
-                continue
-                
-            print(f"\n Mining Block ({len(node.pending_transactions)} pending transactions)")
-            
-            # Show current mempool
-            for i, tx in enumerate(node.pending_transactions, 1):
-                print(f"   {i}. {tx.sender[:16]}... → {tx.recipient[:16]}... : {tx.amount} coins")
-            
-            # Select miner wallet
-            print("\nSelect miner wallet:")
-            wallet_list = list(node.wallets.items())
-            for i, (addr, _) in enumerate(wallet_list, 1):
-                balance = node.get_balance(addr)
-                print(f"{i}. {addr[:16]}... (Balance: {balance} coins)")
-                
-            try:
-                miner_choice = input("Select miner wallet (number): ").strip()
-                miner_idx = int(miner_choice) - 1
-                if 0 <= miner_idx < len(wallet_list):
-                    miner_addr, _ = wallet_list[miner_idx]
-                    miner_pub = node.public_keys.get(miner_addr)
-                else:
-                    print("Invalid wallet selection")
-                    continue
-            except ValueError:
-                print("Invalid input")
-                continue
-                
-            print(f" Mining with difficulty {node.difficulty}...")
-            
-            start_time = time.time()
-            block = node.mine_block(miner_pub)
-            end_time = time.time()
-            
-            if block:
-                user_transactions = [tx for tx in block.transactions if tx.sender != "COINBASE"]
-                mining_reward_tx = [tx for tx in block.transactions if tx.sender == "COINBASE"]
-                mining_reward = mining_reward_tx[0].amount if mining_reward_tx else 0
-                
-                print(f"Block #{block.height} mined successfully!")
-                print(f"  Time: {end_time - start_time:.2f}s")
-                print(f" Hash: {block.hash[:16]}...")
-                print(f" Mining reward: {mining_reward} coins")
-                print(f" Remaining in mempool: {len(node.pending_transactions)}")
-                
-                node.broadcast_block(block)
-            else:
-                print("Mining failed")
-
-        elif choice == '4':
-            # View node
-            print(f"\nNode Explorer ({len(node.chain)} blocks)")
-            print("=" * 60)
-            
-            for block in node.chain:
-                print(f"\nBlock #{block.height}")
-                print(f"   Hash: {block.hash}")
-                print(f"   Previous: {block.previous_hash}")
-                print(f"   Timestamp: {time.ctime(block.timestamp)}")
-                print(f"   Difficulty: {block.difficulty}")
-                print(f"   Nonce: {block.nonce}")
-                print(f"   Mined by: {block.mined_by[:16] if len(block.mined_by) > 16 else block.mined_by}...")
-                print(f"   Merkle root: {block.merkle_root}")
-                
-                if block.transactions:
-                    print(f"   Transactions ({len(block.transactions)}):")
-                    for i, tx in enumerate(block.transactions, 1):
-                        if hasattr(tx, 'sender') and tx.sender == "COINBASE":
-                            print(f"     {i}.COINBASE → {tx.recipient[:16]}... : {tx.amount} coins (reward)")
-                        else:
-                            print(f"     {i}. {tx.sender[:16]}... → {tx.recipient[:16]}... : {tx.amount} coins")
-                else:
-                    print("   Transactions: None (Genesis block)")
-                print("-" * 60)
-
-        elif choice == '5':
-            # Check balance
-            if not node.wallets:
-                print("No wallets available. Create a wallet first.")
-                continue
-                
-            print("\nBalance Checker")
-            wallet_list = list(node.wallets.keys())
-            for i, addr in enumerate(wallet_list, 1):
-                balance = node.get_balance(addr)
-                print(f"{i}. {addr[:16]}... : {balance} coins")
-            
-            try:
-                wallet_choice = input("Select wallet to check (number): ").strip()
-                wallet_idx = int(wallet_choice) - 1
-                if 0 <= wallet_idx < len(wallet_list):
-                    address = wallet_list[wallet_idx]
-                    balance = node.get_balance(address)
-                    
-                    print(f"\n Wallet Details:")
-                    print(f"Address: {address}")
-                    print(f"Balance: {balance} coins")
-                else:
-                    print("Invalid wallet selection")
-            except ValueError:
-                print("Invalid input")
-
-        elif choice == '6':
-            # View all wallets
-            if not node.wallets:
-                print("No wallets available.")
-                continue
-                
-            print(f"\n All Wallets ({len(node.wallets)} total)")
-            print("=" * 70)
-            
-            for i, (addr, priv_key) in enumerate(node.wallets.items(), 1):
-                balance = node.get_balance(addr)
-                pub_key = node.public_keys.get(addr, "Unknown")
-                
-                print(f"\nWallet #{i}")
-                print(f"   Address: {addr}")
-                print(f"   Balance: {balance} coins")
-                print(f"   Public Key: {pub_key}")
-                print("-" * 70)
-            
-
-        elif choice == '7':
-            # Add funds (testing)
-            print("\n Add Test Funds")
-            
-            if not node.wallets:
-                print("No wallets available. Create a wallet first.")
-                continue
-                
-            wallet_list = list(node.wallets.keys())
-            for i, addr in enumerate(wallet_list, 1):
-                balance = node.get_balance(addr)
-                print(f"{i}. {addr[:16]}... : {balance} coins")
-            
-            try:
-                wallet_choice = input("Select wallet to fund (number): ").strip()
-                wallet_idx = int(wallet_choice) - 1
-                if 0 <= wallet_idx < len(wallet_list):
-                    address = wallet_list[wallet_idx]
-                else:
-                    print("Invalid wallet selection")
-                    continue
-                    
-                amount = float(input("Enter amount to add: "))
-                if amount <= 0:
-                    print("Amount must be positive")
-                    continue
-            except (ValueError, IndexError):
-                print("Invalid input")
-                continue
-                
-            # Add funds
-            old_balance = node.balances.get(address, 0)
-            node.balances[address] = old_balance + amount
-            node.save_to_disk()
-            
-            print(f"Added {amount} coins to {address[:16]}...")
-            print(f"New balance: {node.get_balance(address)} coins")
-
-        elif choice == '8':
-            # Basic tests + Difficulty Adjustment Test
-            # Test difficulty adjustment
-            print("\n🔧 Testing Difficulty Adjustment...")
-            
-            # Show current state
-            current_difficulty = node.difficulty
-            chain_length = len(node.chain)
-            print(f"Current difficulty: {current_difficulty}")
-            print(f"Current chain length: {chain_length} blocks")
-            
-            if not node.wallets:
-                print("Creating test wallet for mining...")
-                test_addr, test_priv, test_pub = node.create_wallet(initial_balance=1000)
-                print(f"Created test wallet: {test_addr[:16]}...")
-            else:
-                # Use first available wallet
-                test_addr = list(node.wallets.keys())[0]
-                test_pub = node.public_keys[test_addr]
-            
-            # Create multiple test transactions if mempool is empty
-            if not node.pending_transactions:
-                print("Creating test transactions for mining...")
-                for i in range(3):
-                    # Create self-transactions for testing
-                    test_tx = Transaction(sender=test_pub, recipient=test_pub, amount=1)
-                    test_priv_key = SigningKey(node.wallets[test_addr], encoder=HexEncoder)
-                    test_tx.sign(test_priv_key)
-                    node.add_transaction(test_tx)
-                print(f"Created {len(node.pending_transactions)} test transactions")
-            
-            # Mine several blocks quickly to trigger difficulty adjustment
-            print("\n Mining blocks to demonstrate difficulty adjustment...")
-            blocks_to_mine = 5
-            
-            for i in range(blocks_to_mine):
-                if not node.pending_transactions:
-                    # Create another test transaction
-                    test_tx = Transaction(sender=test_pub, recipient=test_pub, amount=1)
-                    test_priv_key = SigningKey(node.wallets[test_addr], encoder=HexEncoder)
-                    test_tx.sign(test_priv_key)
-                    node.add_transaction(test_tx)
-                
-                print(f"\n--- Mining Block {i+1}/{blocks_to_mine} ---")
-                old_difficulty = node.difficulty
-                
-                start_time = time.time()
-                block = node.mine_block(test_pub)
-                end_time = time.time()
-                
-                if block:
-                    new_difficulty = node.difficulty
-                    
-                    if new_difficulty != old_difficulty:
-                        if new_difficulty > old_difficulty:
-                            print(f"   🔼 Difficulty INCREASED (blocks mined too fast)")
-                        else:
-                            print(f"   🔽 Difficulty DECREASED (blocks mined too slow)")
-                    else:
-                        print(f"   ➖ Difficulty unchanged")
-                else:
-                    print(f" Mining failed for block {i+1}")
-                    break
-            
-            print(f"\n📊 Difficulty Adjustment Summary:")
-            print(f"   Starting difficulty: {current_difficulty}")
-            print(f"   Final difficulty: {node.difficulty}")
-            print(f"   Chain length: {len(node.chain)} blocks")
-            print(f"   Adjustment triggered: {'Yes' if node.difficulty != current_difficulty else 'No'}")
-            
-            # Show recent block times
-            if len(node.chain) >= 3:
-                print(f"\n⏰ Recent Block Times:")
-                recent_blocks = node.chain[-3:]
-                for i in range(1, len(recent_blocks)):
-                    prev_block = recent_blocks[i-1]
-                    curr_block = recent_blocks[i]
-                    time_diff = curr_block.timestamp - prev_block.timestamp
-                    print(f"   Block #{curr_block.height}: {time_diff}s after previous")
-
-        elif choice == '9':
-            is_valid_chain, message = node.is_valid_chain()
-            if is_valid_chain:
-                print("✅ Blockchain is valid!")
-            else:
-                print(f"❌ Blockchain is invalid: {message}")
-            
-        elif choice == '10':
-             # Show current mempool
-            print("\nCurrent Pending Transactions:")
-            for i, tx in enumerate(node.pending_transactions, 1):
-                print(f"   {i}. {tx.sender[:16]}... → {tx.recipient[:16]}... : {tx.amount} coins")
-
-        elif choice == '11':
+        if choice == '11':
             print(" Exiting...")
             break
 
+        handler = HANDLERS.get(choice)
+        if handler:
+            handler(node)
         else:
             print("Invalid choice. Please enter 1-10.")
 
+    # Send any transactions still queued for broadcast and write out any changes
+    # that were deferred by mark_dirty()
+    concurrent.futures.wait(flush_broadcast(node), timeout=5)
+    node.flush()
+
 
 if __name__ == "__main__":
     try:
@@ -425,4 +585,4 @@ if __name__ == "__main__":
         print("\n\nInterrupted by user. Exiting gracefully...")
     except Exception as e:
         print(f"\nUnexpected error: {e}")
-        logging.error(f"Unexpected error in main: {e}", exc_info=True)
\ No newline at end of file
+        logging.error("Unexpected error in main: %s", e, exc_info=True)
\ No newline at end of file
@@ -2,6 +2,10 @@ import hashlib
 import json
 from transaction import Transaction
 
+# json.dumps(obj, sort_keys=True) builds a new JSONEncoder on every call; reuse one.
+# Output is byte-identical, so existing block hashes are unaffected.
+_canonical_json = json.JSONEncoder(sort_keys=True).encode
+
 class Block:
     """Represents a single block in the blockchain."""
     def __init__(
@@ -25,6 +29,8 @@ class Block:
         self.nonce = nonce # Nonce for proof-of-work
         self.timestamp = timestamp
         self.merkle_root = merkle_root or self.calculate_merkle_root() 
+        self._cached_hash = None  # Set by seal() once the block is part of the chain
+        self._preimage = None  # (prefix, suffix) around the nonce, built on first use
 
     def calculate_merkle_root(self):
         """
@@ -32,41 +38,93 @@ class Block:
         Transactions should be a list of dicts or objects with a to_dict() method.
         """
         tx_hashes = [
-            hashlib.sha256(json.dumps(tx if isinstance(tx, dict) else tx.to_dict(), sort_keys=True).encode()).hexdigest()
+            hashlib.sha256(_canonical_json(tx if isinstance(tx, dict) else tx.to_dict()).encode()).hexdigest()
             for tx in self.transactions
         ]
         if not tx_hashes:
             return hashlib.sha256(b'').hexdigest()
+        sha256 = hashlib.sha256
         while len(tx_hashes) > 1:
             if len(tx_hashes) % 2 == 1:
                 tx_hashes.append(tx_hashes[-1])  # duplicate last hash if odd number
+            # Pair up neighbours in one pass over the level
             tx_hashes = [
-                hashlib.sha256((tx_hashes[i] + tx_hashes[i+1]).encode()).hexdigest()
-                for i in range(0, len(tx_hashes), 2)
+                sha256((left + right).encode()).hexdigest()
+                for left, right in zip(tx_hashes[::2], tx_hashes[1::2])
             ]
         return tx_hashes[0]
 
     def calculate_hash(self):
         """
         Calculate the block's SHA-256 hash from all critical fields.
+        Sealed blocks return their memoized hash instead of re-hashing.
+        """
+        if self._cached_hash is not None:
+            return self._cached_hash
+        return self.calculate_digest().hex()
+
+    def recalculate_hash(self):
+        """
+        Hash the block's current fields from scratch, ignoring both the sealed hash
+        and the cached preimage, so edits made after sealing are caught.
+        """
+        return hashlib.sha256(_canonical_json(self._hash_fields(self.nonce, fresh=True)).encode()).hexdigest()
+
+    def calculate_digest(self):
+        """
+        Calculate the raw SHA-256 digest (bytes) of the block's critical fields.
+        Only the nonce is formatted per call; the rest comes from the cached preimage.
+        """
+        prefix, suffix = self.hash_preimage_parts()
+        return hashlib.sha256(prefix + b"%d" % self.nonce + suffix).digest()
+
+    def hash_preimage_parts(self):
+        """
+        Split the hash input around the nonce and return (prefix, suffix) bytes,
+        so that prefix + str(nonce).encode() + suffix is exactly what
+        calculate_digest() hashes for that nonce. Every field except the nonce is
+        fixed once a block is built, so the split is computed once and cached.
+        """
+        if self._preimage is None:
+            # Rebuild the sort_keys encoding member by member and split at the nonce
+            # key itself, so no field value (a peer can choose sender, recipient or
+            # mined_by freely) can be mistaken for the split point
+            fields = self._hash_fields(0)
+            members = [f"{_canonical_json(key)}: {_canonical_json(fields[key])}" for key in sorted(fields)]
+            at = sorted(fields).index('nonce')
+            prefix = "{" + ", ".join(members[:at] + ['"nonce": '])
+            suffix = "".join(", " + member for member in members[at + 1:]) + "}"
+            self._preimage = (prefix.encode(), suffix.encode())
+        return self._preimage
+
+    def _hash_fields(self, nonce, fresh=False):
+        """
+        The fields covered by the block hash, with the given nonce. With fresh=True the
+        transactions are serialized from their current fields, not their memoized dicts.
         """
         transactions_data = [
-            tx if isinstance(tx, dict) else tx.to_dict(include_signature=True)
+            tx if isinstance(tx, dict)
+            else tx.fields_dict() if fresh
+            else tx.to_dict(include_signature=True)
             for tx in self.transactions
         ]
-
-        block_string = json.dumps({
+        return {
             'mined_by': self.mined_by,
             'transactions': transactions_data,
             'height': self.height,
             'difficulty': self.difficulty,
             'previous_hash': self.previous_hash,
-            'nonce': self.nonce,
+            'nonce': nonce,
             'timestamp': self.timestamp,
             'merkle_root': self.merkle_root
-        }, sort_keys=True)
+        }
 
-        return hashlib.sha256(block_string.encode()).hexdigest()
+    def seal(self):
+        """
+        Memoize the block's hash. Only call this once the block has been
+        validated and appended, since a sealed block is never re-hashed.
+        """
+        self._cached_hash = self.hash
 
     def to_dict(self):
         """
@@ -2,11 +2,14 @@ import logging
 import queue
 import threading
 import time
+import socket
+import concurrent.futures
 import requests
+from requests.adapters import HTTPAdapter
 from flask import Flask, request, jsonify
 from flask_socketio import SocketIO
 from models import Block
-from transaction import Transaction
+from transaction import Transaction, verify_transactions
 
 class P2PNode:
     def __init__(self, host, port):
@@ -17,6 +20,13 @@ class P2PNode:
         self.socketio = SocketIO(self.app, async_mode='eventlet')
         self.transaction_queue = queue.Queue()
         self.block_queue = queue.Queue()
+        # Set once the server accepts connections, so callers can wait on it instead of sleeping
+        self.ready = threading.Event()
+        # Keep-alive connection pool shared by all outgoing peer requests
+        self._http = requests.Session()
+        self._http.mount('http://', HTTPAdapter(pool_connections=32, pool_maxsize=32))
+        # Broadcasts run here so callers (e.g. the CLI) never wait on peer I/O
+        self._broadcaster = concurrent.futures.ThreadPoolExecutor(max_workers=32, thread_name_prefix='broadcast')
         self._setup_routes()
 
     def _setup_routes(self):
@@ -24,7 +34,8 @@ class P2PNode:
         @self.app.route('/chain', methods=['GET'])
         def get_chain():
             chain_data = [block.to_dict() for block in self.chain]
-            return jsonify({'length': len(chain_data), 'chain': chain_data}), 200
+            # The length also goes in a header, so peers can skip the body when it is no longer than theirs
+            return jsonify({'length': len(chain_data), 'chain': chain_data}), 200, {'X-Chain-Length': str(len(chain_data))}
 
         @self.app.route('/transaction', methods=['POST'])
         def receive_transaction():
@@ -46,6 +57,27 @@ class P2PNode:
                 logging.error(f"Error receiving transaction: {e}")
                 return jsonify({'error': str(e)}), 400
 
+        @self.app.route('/transactions', methods=['POST'])
+        def receive_transactions():
+            """Batched form of /transaction: one request and one chain sync for many transactions."""
+            try:
+                data = request.get_json()
+                if not data or not data.get('transactions'):
+                    return jsonify({'error': 'No transaction data provided'}), 400
+                
+                txs = [Transaction.from_dict(tx_data) for tx_data in data['transactions']]
+                logging.info(f"Node {self.port} received {len(txs)} transactions via HTTP")
+                
+                # Before processing, sync our chain to get latest balances
+                self.sync_chain()
+                
+                for tx in txs:
+                    self.transaction_queue.put(tx)
+                return jsonify({'message': f'{len(txs)} transactions received successfully'}), 201
+            except Exception as e:
+                logging.error(f"Error receiving transactions: {e}")
+                return jsonify({'error': str(e)}), 400
+
         @self.app.route('/block', methods=['POST'])
         def receive_block():
             try:
@@ -94,50 +126,65 @@ class P2PNode:
     def run(self):
         """Starts the node's server and background queue processor"""
         self._start_queue_processor()
+        threading.Thread(target=self._signal_ready, daemon=True).start()
         logging.info(f"Starting node server at http://{self.host}:{self.port}")
         self.socketio.run(self.app, host=self.host, port=self.port, use_reloader=False)
 
+    def _signal_ready(self, timeout=10):
+        """Set self.ready as soon as the server's listening socket accepts a connection."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection((self.host, self.port), timeout=0.1).close()
+                self.ready.set()
+                return
+            except OSError:
+                time.sleep(0.01)
+        logging.warning(f"Node {self.port}: server did not start listening within {timeout}s")
+
     def connect_to_peer(self, peer_url):
         """Connects this node to a new peer"""
         if peer_url != f"http://{self.host}:{self.port}":
             self.peers.add(peer_url)
             try:
-                requests.post(f"{peer_url}/add_peer", json={'peer_url': f"http://{self.host}:{self.port}"})
+                self._http.post(f"{peer_url}/add_peer", json={'peer_url': f"http://{self.host}:{self.port}"})
                 logging.info(f"Node {self.port} successfully connected to peer {peer_url}")
             except requests.exceptions.RequestException as e:
                 logging.warning(f"Node {self.port} could not connect to peer {peer_url}: {e}")
 
+    def _post_to_peer(self, peer_url, path, payload, what):
+        """POST one broadcast payload to one peer, logging the outcome."""
+        try:
+            response = self._http.post(f"{peer_url}{path}", json=payload, timeout=5)
+            if response.status_code == 201:
+                logging.info(f"Node {self.port}: Successfully sent {what} to {peer_url}")
+            else:
+                logging.warning(f"Node {self.port}: Failed to send {what} to {peer_url}: {response.status_code}")
+        except Exception as e:
+            logging.error(f"Node {self.port}: Failed to broadcast {what} to {peer_url}: {e}")
+
+    def _broadcast(self, path, payload, what):
+        """Send a payload to every peer in parallel without blocking the caller."""
+        return [
+            self._broadcaster.submit(self._post_to_peer, peer_url, path, payload, what)
+            for peer_url in tuple(self.peers)
+        ]
+
     def broadcast_transaction(self, transaction: Transaction):
-        """Broadcasts a transaction to all connected peers via HTTP and SocketIO"""
+        """Broadcasts a transaction to all connected peers via HTTP, in the background"""
         logging.info(f"Node {self.port} broadcasting transaction to {len(self.peers)} peers")
-        for peer_url in self.peers:
-            try:
-                # Send via HTTP POST to the peer's transaction endpoint
-                response = requests.post(f"{peer_url}/transaction", 
-                                       json=transaction.to_dict(), 
-                                       timeout=5)
-                if response.status_code == 201:
-                    logging.info(f"Node {self.port}: Successfully sent transaction to {peer_url}")
-                else:
-                    logging.warning(f"Node {self.port}: Failed to send transaction to {peer_url}: {response.status_code}")
-            except Exception as e:
-                logging.error(f"Node {self.port}: Failed to broadcast transaction to {peer_url}: {e}")
+        return self._broadcast("/transaction", transaction.to_dict(), "transaction")
+
+    def broadcast_transactions(self, transactions):
+        """Broadcasts several transactions to all peers in one request each, in the background"""
+        logging.info(f"Node {self.port} broadcasting {len(transactions)} transactions to {len(self.peers)} peers")
+        payload = {'transactions': [tx.to_dict() for tx in transactions]}
+        return self._broadcast("/transactions", payload, f"{len(transactions)} transactions")
 
     def broadcast_block(self, block: Block):
-        """Broadcasts a newly mined block to all connected peers via HTTP"""
+        """Broadcasts a newly mined block to all connected peers via HTTP, in the background"""
         logging.info(f"Node {self.port} broadcasting block #{block.height} to {len(self.peers)} peers")
-        for peer_url in self.peers:
-            try:
-                # Send via HTTP POST to the peer's block endpoint
-                response = requests.post(f"{peer_url}/block", 
-                                       json=block.to_dict(), 
-                                       timeout=5)
-                if response.status_code == 201:
-                    logging.info(f"Node {self.port}: Successfully sent block to {peer_url}")
-                else:
-                    logging.warning(f"Node {self.port}: Failed to send block to {peer_url}: {response.status_code}")
-            except Exception as e:
-                logging.error(f"Node {self.port}: Failed to broadcast block to {peer_url}: {e}")
+        return self._broadcast("/block", block.to_dict(), "block")
 
     def sync_chain(self):
         """Synchronizes the chain with the longest valid chain from peers"""
@@ -161,28 +208,41 @@ class P2PNode:
                          self.sync_chain()
                     # If the block is the very next one, add it.
                     elif self.is_valid_block(block) and block.hash not in [b.hash for b in self.chain]:
+                        block.seal()
+                        self._resolve_parties(block.transactions)
                         self.chain.append(block)
                         # Remove mined transactions from the pending pool
-                        self.pending_transactions = [tx for tx in self.pending_transactions if tx.signature not in [t.signature for t in block.transactions]]
-                        self.rebuild_balances()
-                        self.save_to_disk()
+                        self._remove_pending(block.transactions)
+                        self.apply_block_to_balances(block)
+                        self.mark_dirty()
                         logging.info(f"P2P: Node {self.port} added block #{block.height} from peer.")
                 except queue.Empty:
                     pass # It's normal for the queue to be empty.
                 except Exception as e:
                     logging.error(f"P2P Error processing block queue: {e}")
                 # This handles transactions that arrive out of order during normal operation.
+                # Everything queued so far is taken at once so the signatures can be checked as a batch.
+                incoming = {}
                 try:
-                    tx = self.transaction_queue.get_nowait()
-                    if tx.signature not in [t.signature for t in self.pending_transactions]:
-                        if tx.verify():
-                            self.pending_transactions.append(tx)
-                            logging.info(f"P2P: Transaction {tx.signature[:8]}... added to pending pool from peer")
+                    while True:
+                        tx = self.transaction_queue.get_nowait()
+                        if tx.signature not in self.pending_transactions:
+                            incoming.setdefault(tx.signature, tx)
                 except queue.Empty:
                     pass
-                except Exception as e:
-                    logging.error(f"P2P Error processing transaction queue: {e}")
+                if incoming:
+                    try:
+                        txs = list(incoming.values())
+                        for tx, valid in zip(txs, verify_transactions(txs)):
+                            if valid:
+                                self._add_pending(tx)
+                                logging.info(f"P2P: Transaction {tx.signature[:8]}... added to pending pool from peer")
+                    except Exception as e:
+                        logging.error(f"P2P Error processing transaction queue: {e}")
                 
+                # Write out any deferred state changes
+                self.maybe_flush()
+
                 # Every 60 seconds, proactively ask peers if they have a longer chain.
                 # This is what allows a node to catch up after being offline.
                 if time.time() - last_sync_time > 60:
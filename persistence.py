@@ -1,12 +1,50 @@
 import json
+import collections
 import os
+import time
 import logging
+import threading
 from transaction import Transaction
 from models import Block
 
 class Persistence:
+    def __init__(self, flush_interval=1.0):
+        self._dirty = False
+        self._last_save = 0.0
+        self.flush_interval = flush_interval  # Minimum seconds between deferred saves
+        self.retry_interval = 10.0  # Seconds to wait before retrying a failed save
+        self._retry_at = 0.0
+        self._save_lock = threading.Lock()  # One save at a time (background loop vs. exit flush)
+
+    def mark_dirty(self):
+        """
+        Record that state changed. The save itself happens off the caller's thread,
+        when the node's background loop next calls maybe_flush(), so consecutive
+        changes are coalesced into one write.
+        """
+        self._dirty = True
+
+    def maybe_flush(self):
+        """Save to disk if there are unsaved changes and the last save is old enough."""
+        now = time.monotonic()
+        if self._dirty and now - self._last_save > self.flush_interval and now >= self._retry_at:
+            self.save_to_disk()
+
+    def flush(self):
+        """Save any unsaved changes immediately."""
+        if self._dirty:
+            self.save_to_disk()
+
     def save_to_disk(self):
         """Save blockchain state to disk using new class-based structures."""
+        with self._save_lock:
+            self._save_locked()
+
+    def _save_locked(self):
+        """save_to_disk() body; the caller holds _save_lock."""
+        # Cleared before the snapshot is taken: a mark_dirty() that lands while we are
+        # serializing sets it again, so that change is saved next time rather than lost
+        self._dirty = False
         try:
             # Convert wallets and public keys to saveable format
             wallets_hex = self.wallets.copy()
@@ -15,20 +53,29 @@ class Persistence:
             # Include initial wallet balances if available
             save_data = {
                 'chain': [block.to_dict() for block in self.chain],
-                'balances': self.balances,
+                # Copied in one step so a save running on the background thread never
+                # iterates a dict that the CLI thread is updating
+                'balances': dict(self.balances),
                 'wallets': wallets_hex,
-                'public_keys': public_keys_hex
+                'public_keys': public_keys_hex,
             }
             
             # Save initial wallet balances if they exist
             if hasattr(self, 'initial_wallet_balances'):
                 save_data['initial_wallet_balances'] = self.initial_wallet_balances
 
+            # json.dumps uses the C encoder in one shot; json.dump to a file
+            # falls back to the pure-Python iterative encoder
+            serialized = json.dumps(save_data)
             with open('blockchain.json', 'w') as f:
-                json.dump(save_data, f)
+                f.write(serialized)
+            self._last_save = time.monotonic()
             logging.info("Blockchain state saved to disk")
         except Exception as e:
-            logging.error(f"Failed to save blockchain state: {e}")
+            # Keep the changes pending, but don't retry (and log) on every loop tick
+            self._dirty = True
+            self._retry_at = time.monotonic() + self.retry_interval
+            logging.error(f"Failed to save blockchain state: {e}; retrying in {self.retry_interval:.0f}s")
 
     def load_from_disk(self):
         """Load blockchain state from disk using new class-based structures."""
@@ -51,7 +98,7 @@ class Persistence:
                             merkle_root=block_data.get('merkle_root')
                         )
                         self.chain.append(block)
-                    self.balances = data.get('balances', {})
+                    self.balances = collections.defaultdict(float, data.get('balances', {}))
                     
                     # Load initial wallet balances if available
                     if 'initial_wallet_balances' in data:
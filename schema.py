@@ -1,5 +1,6 @@
 import hashlib
 import json
+import logging
 from marshmallow import Schema, fields, validates_schema, ValidationError, post_load
 from transaction import Transaction
 from models import Block
@@ -65,11 +66,12 @@ class BlockSchema(Schema):
             'timestamp': block_data_for_hashing['timestamp'],
             'merkle_root': block_data_for_hashing['merkle_root']
         }, sort_keys=True).encode('utf-8')
-        print(f"[Validation] Provided Hash: {provided_hash}")
-        print(f"[Validation] Calculating hash from JSON:\n{block_string}")
         # 4. Calculate the hash and compare
         calculated_hash = hashlib.sha256(block_string).hexdigest()
-        print(f"[Validation] Calculated Hash: {calculated_hash}")
+        # Only format the (large) block string when debug output is actually wanted
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(f"[Validation] Provided Hash: {provided_hash}, Calculated Hash: {calculated_hash}, "
+                          f"from JSON: {block_string}")
         if provided_hash != calculated_hash:
             raise ValidationError(
                 f"Block hash is invalid. Expected: {calculated_hash}, Got: {provided_hash}"
@@ -0,0 +1,57 @@
+import json
+import hashlib
+import unittest
+from nacl.signing import SigningKey
+from nacl.encoding import HexEncoder
+from models import Block
+from transaction import Transaction
+from consensus import Consensus
+
+
+def reference_hash(block, nonce):
+    """The block hash as originally defined: SHA-256 of json.dumps(fields, sort_keys=True)."""
+    return hashlib.sha256(json.dumps(block._hash_fields(nonce), sort_keys=True).encode()).hexdigest()
+
+
+class HashPreimageTest(unittest.TestCase):
+    def test_field_values_that_look_like_a_marker(self):
+        """A tx or miner named "__NONCE__" must not break the preimage split (nor mining)."""
+        signing_key = SigningKey.generate()
+        sender = signing_key.verify_key.encode(HexEncoder).decode()
+        tx = Transaction(sender=sender, recipient="__NONCE__", amount=1)
+        tx.sign(signing_key)
+        last_block = Block("genesis", [], 0, 2, "0" * 64, "0", 0, 1)
+
+        block = Consensus.proof_of_work(last_block, [tx], "__NONCE__", difficulty=2)
+
+        self.assertEqual(block.hash, reference_hash(block, block.nonce))
+        self.assertTrue(Consensus.valid_proof(block, 2))
+
+    def test_preimage_matches_reference_encoding(self):
+        block = Block('"nonce": 1', [{"sender": "__NONCE__", "nonce": 5}], 3, 4, "", "ab", 0, 1700000000)
+        for nonce in (0, 7, 123456789):
+            block.nonce = nonce
+            self.assertEqual(block.calculate_hash(), reference_hash(block, nonce))
+
+
+
+class TamperDetectionTest(unittest.TestCase):
+    def test_transaction_edited_after_sealing_fails_validation(self):
+        """Choice 9 must notice a transaction changed in memory, despite the to_dict() memo."""
+        signing_key = SigningKey.generate()
+        sender = signing_key.verify_key.encode(HexEncoder).decode()
+        tx = Transaction(sender=sender, recipient=sender, amount=1)
+        tx.sign(signing_key)
+        last_block = Block("genesis", [], 0, 2, "0" * 64, "0", 0, 1)
+        block = Consensus.proof_of_work(last_block, [tx], sender, difficulty=2)
+        block.seal()
+        self.assertEqual(block.recalculate_hash(), block.hash)
+        self.assertTrue(tx.verify())
+
+        tx.amount = 99999
+
+        self.assertNotEqual(block.recalculate_hash(), block.hash)
+        self.assertFalse(tx.verify())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,36 @@
 import json
+import os
 import time
+import concurrent.futures
 from nacl.signing import SigningKey, VerifyKey
 from nacl.encoding import HexEncoder
 from nacl.exceptions import BadSignatureError
 
+# Below this many transactions, verifying serially beats starting a thread pool
+PARALLEL_VERIFY_MIN = 16
+
+
+def verify_transactions(transactions):
+    """
+    Verify many transactions' signatures, returning one bool per transaction in order.
+    libsodium releases the GIL while checking a signature, so large batches are
+    spread over a thread pool and verified in parallel.
+    """
+    if len(transactions) < PARALLEL_VERIFY_MIN:
+        return [_verify_quietly(tx) for tx in transactions]
+    workers = min(os.cpu_count() or 1, len(transactions) // PARALLEL_VERIFY_MIN)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_verify_quietly, transactions))
+
+
+def _verify_quietly(tx):
+    """tx.verify(), but a malformed key or signature counts as invalid rather than raising."""
+    try:
+        return tx.verify()
+    except Exception:
+        return False
+
+
 class Transaction:
     def __init__(self, sender, recipient, amount, timestamp=None, signature=None):
         self.sender = sender  # public key (hex string)
@@ -11,8 +38,30 @@ class Transaction:
         self.amount = amount
         self.timestamp = timestamp or int(time.time())
         self.signature = signature  # hex string
+        # Mining rewards carry the "COINBASE" sender and no signature
+        self.is_coinbase = sender == "COINBASE"
+        # Wallet addresses resolved from sender/recipient by the node at ingress
+        self._sender_addr = None
+        self._recipient_addr = None
+        # Memoized to_dict() results; fields are not meant to change after construction
+        # except the signature, and sign() clears these. Callers must not mutate the dicts.
+        # Tamper checks (verify, Block.recalculate_hash) use fields_dict() instead.
+        self._dict_cache = None
+        self._signed_dict_cache = None
 
     def to_dict(self, include_signature=True):
+        if include_signature and self.signature:
+            if self._signed_dict_cache is None:
+                d = dict(self.to_dict(include_signature=False))
+                d["signature"] = self.signature
+                self._signed_dict_cache = d
+            return self._signed_dict_cache
+        if self._dict_cache is None:
+            self._dict_cache = self.fields_dict(include_signature=False)
+        return self._dict_cache
+
+    def fields_dict(self, include_signature=True):
+        """Like to_dict(), but always built from the current fields, never from the memo."""
         d = {
             "sender": self.sender,
             "recipient": self.recipient,
@@ -29,12 +78,14 @@ class Transaction:
         tx_bytes = json.dumps(tx_dict, sort_keys=True).encode("utf-8")
         signature = signing_key.sign(tx_bytes).signature
         self.signature = HexEncoder.encode(signature).decode("utf-8")
+        self._signed_dict_cache = None
 
     def verify(self):
         """Verify the transaction's signature using the sender's public key."""
         if not self.signature:
             return False
-        tx_dict = self.to_dict(include_signature=False)
+        # Built fresh so a field changed after construction fails verification
+        tx_dict = self.fields_dict(include_signature=False)
         tx_bytes = json.dumps(tx_dict, sort_keys=True).encode("utf-8")
         try:
             verify_key = VerifyKey(self.sender, encoder=HexEncoder)